@@ -0,0 +1,297 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Бенчмарк конвейера обработки на синтетических видео.
+
+Тестовые видео генерируются локально через ffmpeg (testsrc + sine),
+скачивание с YouTube и распознавание речи whisper заменяются заглушками.
+Результаты сохраняются в JSON, чтобы сравнивать производительность между коммитами:
+
+    python benchmark.py --output bench_new.json --compare bench_old.json
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import statistics
+import subprocess
+from unittest import mock
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+import video_handler
+from video_layout import RenderCache, default_layout
+from video_processor import (
+    add_subtitles_to_video,
+    combine_videos,
+    get_video_info,
+    split_video,
+    write_srt
+)
+
+def make_fixture(folder, width, height, duration, rate=30):
+    """
+    Генерирует синтетическое видео с тестовой картинкой и синусоидальным звуком.
+    Готовые видео переиспользуются между запусками.
+    
+    Returns:
+        str: Путь к видео
+    """
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"testsrc_{width}x{height}_{duration}s.mp4")
+    if os.path.exists(path):
+        return path
+    print(f"🧪 Генерация тестового видео {width}x{height}, {duration} сек...")
+    subprocess.run([
+        "ffmpeg", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc=size={width}x{height}:rate={rate}:duration={duration}",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={duration}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-shortest", "-y", path
+    ], check=True)
+    return path
+
+def synthetic_segments(duration, segment_length=2.0):
+    """Возвращает сегменты в формате whisper, равномерно покрывающие duration секунд"""
+    segments = []
+    start = 0.0
+    index = 0
+    while start < duration:
+        end = min(start + segment_length, duration)
+        segments.append({
+            'start': start,
+            'end': end,
+            'text': f"synthetic subtitle number {index} for benchmark run"
+        })
+        start = end
+        index += 1
+    return segments
+
+def check_composition(video_file):
+    """
+    Проверяет, что композиция действительно создана по раскладке. combine_videos при
+    ошибке копирует основное видео, и без проверки сбой выглядел бы как быстрый замер.
+    
+    Raises:
+        RuntimeError: Если файла нет или его разрешение не совпадает с холстом
+    """
+    layout = default_layout()
+    if not os.path.exists(video_file):
+        raise RuntimeError(f"Композиция не создана: {video_file}")
+    info = get_video_info(video_file)
+    if (info['width'], info['height']) != (layout.width, layout.height):
+        raise RuntimeError(
+            f"Разрешение композиции {info['width']}x{info['height']} "
+            f"не совпадает с холстом {layout.width}x{layout.height}: {video_file}"
+        )
+
+def remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+def time_call(func, repeat, setup=None, check=None):
+    """
+    Замеряет время выполнения func
+    
+    Args:
+        func (callable): Замеряемая функция без аргументов
+        repeat (int): Количество повторов
+        setup (callable): Подготовка перед каждым повтором (не входит в замер)
+        check (callable): Проверка результата после каждого повтора (не входит в замер)
+        
+    Returns:
+        dict: Минимальное, медианное и максимальное время в секундах
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+        if check:
+            check()
+    return {
+        'min': round(min(timings), 4),
+        'median': round(statistics.median(timings), 4),
+        'max': round(max(timings), 4),
+        'repeat': repeat
+    }
+
+def run_process_flow(main_fixture, background_fixture, duration, work_folder):
+    """Запускает VideoProcessor.process с заглушками скачивания, метаданных и whisper"""
+    def fake_metadata(url):
+        source = background_fixture if "background" in url else main_fixture
+        return {'duration': duration, 'filesize_approx': os.path.getsize(source)}
+    
+    def fake_download(url, filename):
+        source = background_fixture if "background" in url else main_fixture
+        shutil.copy(source, filename)
+        return filename, {'title': 'Benchmark video', 'description': 'synthetic benchmark fixture', 'id': 'benchmark'}
+    
+    def fake_subtitles(video_file, subtitles_file="subtitles.srt"):
+        return write_srt(synthetic_segments(duration), subtitles_file)
+    
+    processor = video_handler.VideoProcessor(
+        main_video_url="benchmark://main",
+        background_video_url="benchmark://background",
+        output_folder=os.path.join(work_folder, "process_output"),
+        render_cache_folder=os.path.join(work_folder, "process_cache")
+    )
+    with mock.patch.object(video_handler, "download_youtube_video", fake_download), \
+            mock.patch.object(video_handler, "get_video_metadata", fake_metadata), \
+            mock.patch.object(video_handler, "generate_subtitles", fake_subtitles):
+        if not processor.process():
+            raise RuntimeError("VideoProcessor.process завершился с ошибкой")
+
+def reset_process_state(work_folder):
+    """
+    Удаляет кэш раскладки, корпус хештегов и результаты предыдущего запуска process,
+    чтобы каждый повтор был холодным и медианы были сопоставимы
+    """
+    for name in ("process_output", "process_cache", "video_logs"):
+        shutil.rmtree(os.path.join(work_folder, name), ignore_errors=True)
+
+def run_benchmarks(resolutions, durations, repeat, fixtures_folder, work_folder):
+    """
+    Выполняет все замеры для каждой комбинации разрешения и длительности
+    
+    Returns:
+        dict: Результаты замеров по имени сценария
+    """
+    results = {}
+    for width, height in resolutions:
+        for duration in durations:
+            name = f"{width}x{height}_{duration}s"
+            main_fixture = make_fixture(fixtures_folder, width, height, duration)
+            # Фон короче основного видео, чтобы замер включал зацикливание
+            background_fixture = make_fixture(fixtures_folder, 1280, 720, max(1, duration // 2))
+            
+            subtitles_file = os.path.join(work_folder, "bench.srt")
+            subtitled = os.path.join(work_folder, "bench_subtitled.mp4")
+            combined = os.path.join(work_folder, "bench_combined.mp4")
+            parts_folder = os.path.join(work_folder, "bench_parts")
+            cache = RenderCache(os.path.join(work_folder, "bench_cache"))
+            segments = synthetic_segments(duration)
+            
+            print(f"⏱️ Сценарий {name}")
+            results[f"write_srt/{name}"] = time_call(lambda: write_srt(segments, subtitles_file), repeat)
+            results[f"get_video_info/{name}"] = time_call(lambda: get_video_info(main_fixture), repeat)
+            results[f"add_subtitles_to_video/{name}"] = time_call(
+                lambda: add_subtitles_to_video(main_fixture, subtitles_file, subtitled), repeat
+            )
+            results[f"combine_videos/{name}"] = time_call(
+                lambda: combine_videos(subtitled, background_fixture, combined, cache=cache),
+                repeat, setup=lambda: (cache.clear(), remove_file(combined)),
+                check=lambda: check_composition(combined)
+            )
+            results[f"combine_videos_cached/{name}"] = time_call(
+                lambda: combine_videos(subtitled, background_fixture, combined, cache=cache),
+                repeat, setup=lambda: remove_file(combined),
+                check=lambda: check_composition(combined)
+            )
+            results[f"split_video/{name}"] = time_call(
+                lambda: split_video(combined, parts_folder, segment_time=max(1, duration // 3)),
+                repeat, setup=lambda: shutil.rmtree(parts_folder, ignore_errors=True)
+            )
+            results[f"process/{name}"] = time_call(
+                lambda: run_process_flow(main_fixture, background_fixture, duration, work_folder),
+                repeat, setup=lambda: reset_process_state(work_folder),
+                check=lambda: check_composition(os.path.join(work_folder, "process_output", "video_01", "full_video.mp4"))
+            )
+    
+    return results
+
+def git_commit():
+    result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, cwd=current_dir)
+    return result.stdout.strip() or None
+
+def compare_results(current, previous, tolerance):
+    """
+    Сравнивает медианы с предыдущим запуском
+    
+    Returns:
+        list: Имена сценариев, замедлившихся больше чем на tolerance
+    """
+    regressions = []
+    for name, timing in sorted(current.items()):
+        old = previous.get(name)
+        if not old or not old['median']:
+            continue
+        ratio = timing['median'] / old['median']
+        marker = "❌" if ratio > 1 + tolerance else "✓"
+        print(f"  {marker} {name}: {old['median']:.4f} → {timing['median']:.4f} сек (x{ratio:.2f})")
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+    return regressions
+
+def parse_resolutions(value):
+    return [tuple(int(side) for side in item.split("x")) for item in value.split(",")]
+
+def parse_durations(value):
+    return [int(item) for item in value.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк конвейера обработки видео")
+    parser.add_argument("--resolutions", type=parse_resolutions, default=parse_resolutions("640x360,1280x720,1920x1080"),
+                        help="Разрешения тестовых видео через запятую")
+    parser.add_argument("--durations", type=parse_durations, default=parse_durations("10,60"),
+                        help="Длительности тестовых видео в секундах через запятую")
+    parser.add_argument("--repeat", type=int, default=3, help="Количество повторов каждого замера")
+    parser.add_argument("--fixtures", default="benchmark_fixtures", help="Папка для тестовых видео")
+    parser.add_argument("--workdir", help="Папка, внутри которой создается временная папка для промежуточных файлов "
+                                           "(по умолчанию - системная временная папка)")
+    parser.add_argument("--output", default="benchmark_results.json", help="Файл для сохранения результатов")
+    parser.add_argument("--compare", help="JSON с результатами предыдущего запуска")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Допустимое замедление (0.2 = 20%%)")
+    args = parser.parse_args()
+    
+    fixtures_folder = os.path.abspath(args.fixtures)
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+    
+    # Конвейер пишет временные файлы в текущую папку, поэтому работаем в отдельной,
+    # созданной бенчмарком временной папке и удаляем только ее
+    work_folder = tempfile.mkdtemp(prefix="benchmark_", dir=args.workdir)
+    original_dir = os.getcwd()
+    output_file = os.path.abspath(args.output)
+    compare_file = os.path.abspath(args.compare) if args.compare else None
+    os.chdir(work_folder)
+    
+    try:
+        results = run_benchmarks(args.resolutions, args.durations, args.repeat, fixtures_folder, work_folder)
+    finally:
+        os.chdir(original_dir)
+        shutil.rmtree(work_folder, ignore_errors=True)
+    
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Результаты сохранены: {output_file}")
+    
+    if compare_file:
+        with open(compare_file, 'r', encoding='utf-8') as f:
+            previous = json.load(f)
+        print(f"📊 Сравнение с {previous.get('commit')}:")
+        regressions = compare_results(results, previous.get('results', {}), args.tolerance)
+        if regressions:
+            print(f"❌ Замедлились сценарии: {', '.join(regressions)}")
+            sys.exit(1)
+        print("✅ Регрессий не обнаружено")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Проверка времени холодного запуска CLI.
+
+Запускает `python -X importtime main.py --help` и суммирует время импорта
+модулей верхнего уровня. Завершается с кодом 1, если суммарное время
+превышает бюджет или если при запуске импортируются тяжелые модули.
+
+    python check_startup.py --budget-ms 150
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+
+# Модули, которые не должны загружаться до начала реальной обработки
+HEAVY_MODULES = ("whisper", "torch", "yt_dlp", "numpy")
+
+def parse_importtime(stderr):
+    """
+    Разбирает вывод -X importtime
+    
+    Args:
+        stderr (str): Вывод интерпретатора в stderr
+        
+    Returns:
+        tuple: (суммарное время импорта верхнего уровня в мкс, список импортированных модулей)
+    """
+    total_us = 0
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            # Строка заголовка таблицы
+            continue
+        cumulative = int(parts[1].strip())
+        name = parts[2]
+        modules.append(name.strip())
+        # Модули верхнего уровня печатаются с одним пробелом отступа
+        if not name.startswith("  "):
+            total_us += cumulative
+    return total_us, modules
+
+def measure_startup(script, runs=5):
+    """
+    Измеряет время импорта при запуске script --help
+    
+    Args:
+        script (str): Путь к проверяемому скрипту
+        runs (int): Количество запусков (берется минимальное значение)
+        
+    Returns:
+        tuple: (время импорта в мс, список импортированных модулей)
+    """
+    best_us = None
+    modules = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", script, "--help"],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Скрипт завершился с ошибкой: {result.stderr.strip()}")
+        total_us, modules = parse_importtime(result.stderr)
+        if best_us is None or total_us < best_us:
+            best_us = total_us
+    return best_us / 1000, modules
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка времени запуска main.py")
+    parser.add_argument("--budget-ms", type=float, default=150.0, help="Допустимое время импорта в миллисекундах")
+    parser.add_argument("--runs", type=int, default=5, help="Количество запусков")
+    args = parser.parse_args()
+    
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    import_ms, modules = measure_startup(script, args.runs)
+    
+    print(f"⏱️ Время импорта при запуске: {import_ms:.1f} мс (бюджет: {args.budget_ms:.1f} мс)")
+    
+    failed = False
+    heavy = sorted({m for m in modules if m.split(".")[0] in HEAVY_MODULES})
+    if heavy:
+        print(f"❌ При запуске импортируются тяжелые модули: {', '.join(heavy)}")
+        failed = True
+    if import_ms > args.budget_ms:
+        print(f"❌ Время запуска превышает бюджет на {import_ms - args.budget_ms:.1f} мс")
+        failed = True
+    
+    if failed:
+        sys.exit(1)
+    print("✅ Время запуска в пределах бюджета")
+
+if __name__ == "__main__":
+    main()
@@ -6,25 +6,18 @@ import os
 import traceback
 import argparse
 
-# Добавление отладочной печати для проверки запуска
-print("Скрипт запущен!")
-
 # Добавляем текущую директорию в путь поиска модулей
 current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.append(current_dir)
 
-print(f"Текущая директория добавлена в путь: {current_dir}")
-print(f"Путь поиска модулей: {sys.path}")
+# Отладочная печать включается флагом --verbose
+VERBOSE = False
 
-try:
-    print("Попытка импорта video_handler...")
-    from video_handler import VideoProcessor
-    print("Импорт video_handler успешен")
-except Exception as e:
-    print(f"Ошибка при импорте: {e}")
-    traceback.print_exc()
-    sys.exit(1)
+def debug(message):
+    """Печатает отладочное сообщение, только если включен флаг --verbose"""
+    if VERBOSE:
+        print(message)
 
 def parse_arguments():
     parser = argparse.ArgumentParser(description="Обработка видео YouTube")
@@ -46,18 +39,44 @@ def parse_arguments():
     # Параметры вывода
     parser.add_argument("--output", default="output_parts", help="Папка для сохранения результатов")
     parser.add_argument("--final", default="final_with_subtitles.mp4", help="Имя финального файла")
+    parser.add_argument("--hls", action="store_true", help="Дополнительно упаковать полное видео в HLS")
+    parser.add_argument("--no-previews", action="store_true", help="Не создавать обложки частей и контактный лист")
+    
+    # Параметры планирования
+    parser.add_argument("--workers", type=int, default=1, help="Количество видео, обрабатываемых одновременно")
+    parser.add_argument("--disk-watermark-gb", type=float, default=5, help="Минимальное свободное место на диске (ГБ)")
+    
+    # Отладочный вывод
+    parser.add_argument("-v", "--verbose", action="store_true", help="Печатать отладочную информацию")
     
     return parser.parse_args()
 
 # python main.py --channel https://www.youtube.com/@FilmIsNowEpicScenes/videos --count 2 --skip 2 --background-playlist https://www.youtube.com/playlist?list=PLdxE72LlkFodEb4jBP8ewH1-qfUcneR7Z
 
 def main():
+    global VERBOSE
+    
+    # Разбор аргументов выполняется до импорта тяжелых модулей,
+    # чтобы --help и ошибки в аргументах не ждали загрузки whisper/torch и yt_dlp
+    args = parse_arguments()
+    VERBOSE = args.verbose
+    
+    debug("Скрипт запущен!")
+    debug(f"Текущая директория добавлена в путь: {current_dir}")
+    debug(f"Путь поиска модулей: {sys.path}")
+    
+    try:
+        debug("Попытка импорта video_handler...")
+        from video_handler import VideoProcessor
+        debug("Импорт video_handler успешен")
+    except Exception as e:
+        print(f"Ошибка при импорте: {e}")
+        traceback.print_exc()
+        sys.exit(1)
+    
     print("🚀 Запуск обработки видео...")
     
     try:
-        # Получаем аргументы командной строки
-        args = parse_arguments()
-        
         # Проверяем, указан ли URL видео или канала
         main_video_url = args.video
         channel_url = args.channel
@@ -70,7 +89,7 @@ def main():
         if not background_video_url and not background_playlist_url:
             background_video_url = "https://www.youtube.com/watch?v=g8YF_d_sAyU"
         
-        print("Создание экземпляра VideoProcessor...")
+        debug("Создание экземпляра VideoProcessor...")
         processor = VideoProcessor(
             main_video_url=main_video_url,
             channel_url=channel_url,
@@ -79,10 +98,14 @@ def main():
             background_video_url=background_video_url,
             background_playlist_url=background_playlist_url,
             output_folder=args.output,
-            final_with_subtitles=args.final
+            final_with_subtitles=args.final,
+            package_hls=args.hls,
+            max_workers=args.workers,
+            disk_watermark_gb=args.disk_watermark_gb,
+            previews=not args.no_previews
         )
         
-        print("Запуск процесса обработки...")
+        debug("Запуск процесса обработки...")
         result = processor.process()
         print(f"Результат обработки: {'Успешно' if result else 'Ошибка'}")
         
@@ -91,7 +114,6 @@ def main():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    print("Запуск main()...")
     main()
-    print("Завершение работы скрипта")
+    debug("Завершение работы скрипта")
 
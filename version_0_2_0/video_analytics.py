@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+
+"""
+Аналитика метаданных видео: постоянный корпус токенов канала и
+ранжирование хештегов по TF-IDF.
+
+Корпус хранится в JSON снимке и журнале добавленных документов. Добавление
+видео дописывает в журнал только его токены, то есть стоит O(число его
+токенов); журнал время от времени сворачивается в новый снимок.
+"""
+
+import os
+import re
+import json
+import math
+from collections import Counter
+
+TOKEN_PATTERN = re.compile(r'\w+')
+SRT_TIMING_PATTERN = re.compile(r'^\d{2}:\d{2}:\d{2},\d{3} --> ')
+
+STOP_WORDS = frozenset([
+    'и', 'в', 'на', 'с', 'по', 'из', 'за', 'под', 'для', 'к', 'от', 'как', 'что', 'это',
+    'или', 'если', 'чтобы', 'только', 'когда', 'было', 'были', 'этот', 'этого', 'также',
+    'the', 'a', 'an', 'of', 'to', 'in', 'and', 'for', 'with', 'this', 'that', 'from',
+    'your', 'what', 'have', 'will', 'just', 'about', 'more', 'they', 'there', 'their',
+    'http', 'https', 'www', 'com'
+])
+
+COMMON_HASHTAGS = ["#shorts", "#trending", "#viral"]
+
+def tokenize(text, min_length=4):
+    """
+    Разбивает текст на токены без стоп-слов и коротких слов
+    
+    Args:
+        text (str): Исходный текст
+        min_length (int): Минимальная длина токена
+        
+    Returns:
+        list: Список токенов в нижнем регистре
+    """
+    return [
+        word for word in TOKEN_PATTERN.findall(text.lower())
+        if len(word) >= min_length and word not in STOP_WORDS and not word.isdigit()
+    ]
+
+def read_srt_text(subtitles_file):
+    """
+    Извлекает текст реплик из SRT файла без номеров и таймкодов
+    
+    Args:
+        subtitles_file (str): Путь к SRT файлу
+        
+    Returns:
+        str: Текст субтитров
+    """
+    lines = []
+    with open(subtitles_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.isdigit() or SRT_TIMING_PATTERN.match(line):
+                continue
+            lines.append(line)
+    return " ".join(lines)
+
+class HashtagCorpus:
+    """
+    Постоянный корпус документов канала для ранжирования хештегов по TF-IDF
+    
+    Args:
+        corpus_file (str): Путь к JSON снимку корпуса (журнал хранится рядом, с суффиксом .log)
+        compact_every (int): Через сколько записей журнала сворачивать его в снимок
+    """
+    def __init__(self, corpus_file, compact_every=100):
+        self.corpus_file = corpus_file
+        self.log_file = corpus_file + ".log"
+        self.compact_every = compact_every
+        self.documents = 0
+        self.document_ids = set()
+        self.document_frequency = Counter()
+        self.token_counts = Counter()
+        self.log_entries = 0
+        
+        if os.path.exists(corpus_file):
+            with open(corpus_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.documents = data.get('documents', 0)
+            self.document_ids = set(data.get('document_ids', []))
+            self.document_frequency.update(data.get('document_frequency', {}))
+            self.token_counts.update(data.get('token_counts', {}))
+        
+        if os.path.exists(self.log_file):
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Недописанная строка после аварийного завершения
+                        continue
+                    self._apply(entry.get('id'), Counter(entry.get('counts', {})))
+                    self.log_entries += 1
+    
+    def _apply(self, document_id, token_counts):
+        if document_id and document_id in self.document_ids:
+            return False
+        if document_id:
+            self.document_ids.add(document_id)
+        self.documents += 1
+        self.document_frequency.update(token_counts.keys())
+        self.token_counts.update(token_counts)
+        return True
+    
+    def add_document(self, document_id, token_counts):
+        """
+        Добавляет документ в корпус и дописывает его в журнал.
+        Повторно добавленный документ не учитывается.
+        
+        Args:
+            document_id (str): Уникальный идентификатор видео
+            token_counts (Counter): Количество вхождений токенов в документе
+            
+        Returns:
+            bool: True, если документ был добавлен
+        """
+        if not self._apply(document_id, token_counts):
+            return False
+        
+        folder = os.path.dirname(self.log_file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.log_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'id': document_id, 'counts': dict(token_counts)}, ensure_ascii=False) + "\n")
+        self.log_entries += 1
+        
+        if self.log_entries >= self.compact_every:
+            self.compact()
+        return True
+    
+    def idf(self, token):
+        """Сглаженная обратная частота документа"""
+        return math.log((1 + self.documents) / (1 + self.document_frequency[token])) + 1
+    
+    def rank(self, token_counts, limit=10):
+        """
+        Ранжирует токены документа по TF-IDF
+        
+        Args:
+            token_counts (Counter): Количество вхождений токенов в документе
+            limit (int): Максимальное количество результатов
+            
+        Returns:
+            list: Словари с полями token, score, tf, df, отсортированные по убыванию score
+        """
+        total = sum(token_counts.values())
+        if not total:
+            return []
+        ranked = [
+            {
+                'token': token,
+                'score': round(count / total * self.idf(token), 6),
+                'tf': count,
+                'df': self.document_frequency[token]
+            }
+            for token, count in token_counts.items()
+        ]
+        # При равном score предпочитаем более частые в документе, затем по алфавиту
+        ranked.sort(key=lambda item: (-item['score'], -item['tf'], item['token']))
+        return ranked[:limit]
+    
+    def process_video(self, document_id, title, description, transcript=None, transcript_weight=0.5, limit=10):
+        """
+        Добавляет видео в корпус и возвращает его ранжированные токены
+        
+        Args:
+            document_id (str): Идентификатор видео
+            title (str): Название видео
+            description (str): Описание видео
+            transcript (str): Текст субтитров (необязательно)
+            transcript_weight (float): Вес токенов из субтитров относительно названия и описания
+            limit (int): Максимальное количество результатов
+            
+        Returns:
+            list: Ранжированные токены (см. rank)
+        """
+        token_counts = Counter(tokenize(f"{title} {description}"))
+        if transcript:
+            for token, count in Counter(tokenize(transcript)).items():
+                token_counts[token] += count * transcript_weight
+        self.add_document(document_id, token_counts)
+        return self.rank(token_counts, limit=limit)
+    
+    def compact(self):
+        """
+        Сворачивает журнал в новый снимок корпуса. Снимок записывается атомарно
+        (через временный файл); если журнал не успеет очиститься, повторное чтение
+        его записей безопасно, так как уже известные документы пропускаются.
+        """
+        folder = os.path.dirname(self.corpus_file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        temp_file = self.corpus_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'documents': self.documents,
+                'document_ids': sorted(self.document_ids),
+                'document_frequency': dict(self.document_frequency),
+                'token_counts': dict(self.token_counts)
+            }, f, ensure_ascii=False)
+        os.replace(temp_file, self.corpus_file)
+        if os.path.exists(self.log_file):
+            os.remove(self.log_file)
+        self.log_entries = 0
+
+def hashtags_from_ranking(ranked):
+    """Преобразует ранжированные токены в список хештегов с общими хештегами в конце"""
+    return [f"#{item['token']}" for item in ranked] + COMMON_HASHTAGS
+
+def write_hashtag_files(parts_folder, video_index, video_title, video_id, ranked, corpus):
+    """
+    Записывает hashtags.txt и машиночитаемый hashtags.json в папку с нарезками
+    
+    Returns:
+        list: Итоговый список хештегов
+    """
+    hashtags = hashtags_from_ranking(ranked)
+    
+    hashtag_file = os.path.join(parts_folder, "hashtags.txt")
+    with open(hashtag_file, 'w', encoding='utf-8') as f:
+        f.write(f"РЕКОМЕНДУЕМЫЕ ХЕШТЕГИ ДЛЯ ВИДЕО {video_index}\n")
+        f.write(f"{'='*50}\n")
+        f.write(f"Название: {video_title}\n\n")
+        f.write(f"Хештеги:\n{' '.join(hashtags)}\n")
+    
+    json_file = os.path.join(parts_folder, "hashtags.json")
+    with open(json_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'video_index': video_index,
+            'video_id': video_id,
+            'title': video_title,
+            'hashtags': hashtags,
+            'ranking': ranked,
+            'corpus_documents': corpus.documents
+        }, f, ensure_ascii=False, indent=2)
+    
+    return hashtags
@@ -1,8 +1,9 @@
 import os
 import random
-import yt_dlp
 
 def download_youtube_video(url, filename):
+    # yt_dlp импортируется лениво, чтобы не замедлять запуск CLI
+    import yt_dlp
     ydl_opts = {
         "format": "bv*[height<=1080]+ba/b[height<=1080]",
         "outtmpl": filename,
@@ -12,7 +13,30 @@ def download_youtube_video(url, filename):
         info = ydl.extract_info(url, download=True)
         return filename if os.path.exists(filename) else None, info
 
+def get_video_metadata(url):
+    """
+    Получает длительность и примерный размер видео без скачивания
+    
+    Args:
+        url (str): URL видео
+        
+    Returns:
+        dict: Словарь с ключами duration (сек) и filesize_approx (байт), значения могут быть None
+    """
+    import yt_dlp
+    ydl_opts = {
+        "quiet": True,
+        "format": "bv*[height<=1080]+ba/b[height<=1080]",
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    return {
+        'duration': info.get('duration'),
+        'filesize_approx': info.get('filesize') or info.get('filesize_approx')
+    }
+
 def get_random_video_from_playlist(playlist_url):
+    import yt_dlp
     ydl_opts = {
         "quiet": True,
         "extract_flat": True,
@@ -40,6 +64,8 @@ def get_videos_from_channel(channel_url, count=1, skip=0):
     Returns:
         list: Список URL видео и их информации
     """
+    import yt_dlp
+    
     ydl_opts = {
         "quiet": True,
         "extract_flat": True,
@@ -64,46 +90,11 @@ def get_videos_from_channel(channel_url, count=1, skip=0):
                         'title': entry.get('title', 'Без названия'),
                         'id': entry.get('id', ''),
                         'uploader': entry.get('uploader', 'Неизвестный автор'),
-                        'description': entry.get('description', '')
+                        'description': entry.get('description', ''),
+                        # Длительность нужна планировщику до скачивания видео
+                        'duration': entry.get('duration'),
+                        'filesize_approx': entry.get('filesize_approx')
                     }
                     videos.append(video_info)
     
-    return videos
-
-def generate_hashtags(video_title, video_description):
-    """
-    Генерирует рекомендуемые хештеги на основе названия и описания видео
-    
-    Args:
-        video_title (str): Название видео
-        video_description (str): Описание видео
-        
-    Returns:
-        list: Список рекомендуемых хештегов
-    """
-    # Объединяем название и описание
-    text = f"{video_title} {video_description}"
-    
-    # Удаляем специальные символы и разбиваем на слова
-    import re
-    words = re.findall(r'\w+', text.lower())
-    
-    # Фильтруем стоп-слова и короткие слова
-    stop_words = ['и', 'в', 'на', 'с', 'по', 'из', 'за', 'под', 'для', 'к', 'от', 'the', 'a', 'an', 'of', 'to', 'in', 'и', 'как', 'что', 'это']
-    filtered_words = [word for word in words if word not in stop_words and len(word) > 3]
-    
-    # Считаем частоту слов
-    from collections import Counter
-    word_counts = Counter(filtered_words)
-    
-    # Выбираем топ-10 наиболее частых слов
-    top_words = [word for word, _ in word_counts.most_common(10)]
-    
-    # Преобразуем в хештеги
-    hashtags = [f"#{word}" for word in top_words]
-    
-    # Добавляем общие хештеги
-    common_hashtags = ["#shorts", "#trending", "#viral"]
-    hashtags.extend(common_hashtags)
-    
-    return hashtags
\ No newline at end of file
+    return videos
\ No newline at end of file
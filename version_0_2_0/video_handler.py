@@ -3,18 +3,35 @@
 
 import os
 import time
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from video_downloader import (
     download_youtube_video, 
     get_random_video_from_playlist, 
-    get_videos_from_channel,
-    generate_hashtags
+    get_video_metadata,
+    get_videos_from_channel
 )
 from video_processor import (
     generate_subtitles, 
     add_subtitles_to_video, 
     combine_videos, 
+    get_video_info,
     split_video
 )
+from video_layout import RenderCache, default_layout
+from video_previews import PreviewSampler
+from video_analytics import HashtagCorpus, hashtags_from_ranking, read_srt_text, write_hashtag_files
+from video_scheduler import (
+    DEFAULT_DURATION,
+    DEFAULT_SOURCE_BITRATE,
+    DiskSpaceScheduler,
+    IntermediateFiles,
+    estimate_job_footprint,
+    parse_bitrate,
+    paths_size
+)
 
 class VideoProcessor:
     def __init__(
@@ -28,7 +45,16 @@ class VideoProcessor:
         output_folder="output_videos",
         final_video="final_full.mp4",
         subtitles_video="main_with_subtitles.mp4",
-        final_with_subtitles="final_with_subtitles.mp4"
+        final_with_subtitles="final_with_subtitles.mp4",
+        layout=None,
+        render_cache_folder="render_cache",
+        render_cache_gb=10,
+        hashtags_from_transcript=True,
+        package_hls=False,
+        max_workers=1,
+        disk_watermark_gb=5,
+        segment_time=120,
+        previews=True
     ):
         self.main_video_url = main_video_url
         self.channel_url = channel_url
@@ -40,6 +66,9 @@ class VideoProcessor:
         self.final_video = final_video
         self.subtitles_video = subtitles_video
         self.final_with_subtitles = final_with_subtitles
+        self.package_hls = package_hls
+        self.segment_time = segment_time
+        self.previews = previews
         
         self.main_video_file = "downloaded_main.mp4"
         self.background_video_file = "downloaded_background.mp4"
@@ -53,6 +82,20 @@ class VideoProcessor:
         self.logs_folder = "video_logs"
         os.makedirs(self.logs_folder, exist_ok=True)
         
+        # Раскладка холста и кэш подготовленных фоновых полос и наложений
+        self.layout = layout or default_layout()
+        self.render_cache = RenderCache(render_cache_folder, max_bytes=int(render_cache_gb * 1024 ** 3))
+        
+        # Корпус для ранжирования хештегов хранится отдельно для каждого канала
+        self.hashtags_from_transcript = hashtags_from_transcript
+        corpus_key = hashlib.sha1((self.channel_url or "single_videos").encode()).hexdigest()[:12]
+        self.hashtag_corpus = HashtagCorpus(os.path.join(self.logs_folder, f"hashtag_corpus_{corpus_key}.json"))
+        self.corpus_lock = threading.Lock()
+        
+        # Видео допускаются к обработке, только пока на диске остается не меньше disk_watermark_gb
+        self.max_workers = max(1, max_workers)
+        self.scheduler = DiskSpaceScheduler(".", watermark_bytes=int(disk_watermark_gb * 1024 ** 3))
+        
     def process(self):
         try:
             videos_to_process = []
@@ -75,149 +118,26 @@ class VideoProcessor:
             
             processed_videos = []
             
-            # Обрабатываем каждое видео
-            for index, video_info in enumerate(videos_to_process):
-                print(f"\n{'='*50}")
-                print(f"🎬 Обработка видео {index+1}/{len(videos_to_process)}: {video_info.get('title', 'Без названия')}")
-                print(f"{'='*50}\n")
-                
-                # Создаем уникальные имена файлов для каждого видео
-                video_index = f"{index+1:02d}"
-                main_video_file = f"downloaded_main_{video_index}.mp4"
-                subtitles_file = f"subtitles_{video_index}.srt"
-                subtitles_video = f"main_with_subtitles_{video_index}.mp4"
-                final_with_subtitles = f"final_with_subtitles_{video_index}.mp4"
-                
-                # Создаем отдельную папку для каждого видео
-                video_folder = os.path.join(self.output_folder, f"video_{video_index}")
-                os.makedirs(video_folder, exist_ok=True)
-                
-                # Шаг 1: Скачивание видео
-                print(f"🔻 Скачивание видео {video_index}...")
-                main_video_file, video_details = download_youtube_video(video_info['url'], main_video_file)
-                
-                # Получаем полную информацию о видео
-                video_title = video_details.get('title', video_info.get('title', 'Без названия'))
-                video_description = video_details.get('description', video_info.get('description', ''))
-                video_uploader = video_details.get('uploader', video_info.get('uploader', 'Неизвестный автор'))
-                video_id = video_details.get('id', video_info.get('id', ''))
-                
-                # Создаем безопасное имя для папки с видео (удаляем недопустимые символы)
-                safe_title = ''.join(c for c in video_title if c.isalnum() or c in ' _-')
-                safe_title = safe_title.strip()
-                if len(safe_title) > 50:  # Ограничиваем длину имени папки
-                    safe_title = safe_title[:50]
-                
-                # Создаем именованную папку для конкретного видео внутри video_XX
-                parts_folder = os.path.join(video_folder, f"{safe_title}")
-                os.makedirs(parts_folder, exist_ok=True)
-                
-                # Генерируем хештеги
-                hashtags = generate_hashtags(video_title, video_description)
-                
-                print(f"✅ Видео загружено: {main_video_file}")
-                print(f"\n{'*'*50}")
-                print(f"📋 ИНФОРМАЦИЯ О ВИДЕО {video_index}:")
-                print(f"{'*'*50}")
-                print(f"🏷️ Название: {video_title}")
-                print(f"👤 Автор: {video_uploader}")
-                print(f"🔖 Рекомендуемые хештеги: {' '.join(hashtags)}")
-                print(f"{'*'*50}\n")
-                
-                # Сохраняем информацию о видео в лог-файл в папке видео
-                log_file = os.path.join(video_folder, "video_info.txt")
-                with open(log_file, 'w', encoding='utf-8') as f:
-                    f.write(f"ИНФОРМАЦИЯ О ВИДЕО {video_index}\n")
-                    f.write(f"{'='*50}\n")
-                    f.write(f"Название: {video_title}\n")
-                    f.write(f"Автор: {video_uploader}\n")
-                    f.write(f"URL: {video_info['url']}\n")
-                    f.write(f"ID: {video_id}\n\n")
-                    f.write(f"ОПИСАНИЕ:\n{video_description}\n\n")
-                    f.write(f"РЕКОМЕНДУЕМЫЕ ХЕШТЕГИ:\n{' '.join(hashtags)}\n")
-                
-                # Выбор фонового видео из плейлиста, если предоставлен URL плейлиста
-                if self.background_playlist_url and not self.background_video_url:
-                    background_video_url = get_random_video_from_playlist(self.background_playlist_url)
-                    if not background_video_url:
-                        print("❌ Не удалось получить видео из плейлиста")
-                        continue
-                else:
-                    background_video_url = self.background_video_url
-                
-                background_video_file = f"downloaded_background_{video_index}.mp4"
-                print("🔻 Скачивание фонового видео...")
-                background_video_file, _ = download_youtube_video(background_video_url, background_video_file)
-                print(f"✅ Фоновое видео загружено: {background_video_file}")
-                
-                # Шаг 2: Генерация субтитров
-                print("🔊 Генерация субтитров...")
-                subtitles_file = generate_subtitles(main_video_file, subtitles_file)
-                print(f"✅ Субтитры созданы: {subtitles_file}")
-                
-                # Сохраняем копию субтитров в папку видео
-                subtitles_copy = os.path.join(video_folder, "subtitles.srt")
-                with open(subtitles_file, 'r', encoding='utf-8') as src, open(subtitles_copy, 'w', encoding='utf-8') as dst:
-                    dst.write(src.read())
-                
-                # Шаг 3: Добавление субтитров к основному видео
-                print("🎬 Добавление субтитров к видео...")
-                subtitles_video = add_subtitles_to_video(
-                    main_video_file, 
-                    subtitles_file, 
-                    subtitles_video
-                )
-                print(f"✅ Видео с субтитрами создано: {subtitles_video}")
-                
-                # Шаг 4: Объединение видео
-                print("🛠️ Объединение видео...")
-                final_with_subtitles = combine_videos(
-                    subtitles_video,
-                    background_video_file,
-                    final_with_subtitles
-                )
-                print(f"✅ Объединенное видео создано: {final_with_subtitles}")
-                
-                # Сохраняем копию полного видео в папку видео
-                full_video_copy = os.path.join(video_folder, "full_video.mp4")
-                import shutil
-                shutil.copy(final_with_subtitles, full_video_copy)
-                
-                # Шаг 5: Разбиение на части
-                print("✂️ Разбиение на части...")
-                output_parts_folder = split_video(final_with_subtitles, parts_folder)
-                print(f"✅ Нарезки сохранены в папке: {output_parts_folder}")
-                
-                # Добавляем информацию о хештегах в отдельный файл в папке с нарезками
-                hashtag_file = os.path.join(parts_folder, "hashtags.txt")
-                with open(hashtag_file, 'w', encoding='utf-8') as f:
-                    f.write(f"РЕКОМЕНДУЕМЫЕ ХЕШТЕГИ ДЛЯ ВИДЕО {video_index}\n")
-                    f.write(f"{'='*50}\n")
-                    f.write(f"Название: {video_title}\n\n")
-                    f.write(f"Хештеги:\n{' '.join(hashtags)}\n")
-                
-                # Сохраняем информацию об обработанном видео
-                processed_videos.append({
-                    'index': video_index,
-                    'title': video_title,
-                    'folder': video_folder,
-                    'parts_folder': parts_folder
-                })
-                
-                # Шаг 6: Очистка временных файлов
-                self.cleanup([
-                    main_video_file,
-                    background_video_file,
-                    subtitles_file,
-                    f"audio_{video_index}.aac",
-                    subtitles_video,
-                    final_with_subtitles
-                ])
-                
-                # Делаем небольшую паузу между обработкой видео
-                if index < len(videos_to_process) - 1:
-                    print("⏳ Пауза перед обработкой следующего видео...")
-                    time.sleep(2)
+            if self.max_workers > 1:
+                # Параллельная обработка: задания допускаются планировщиком по свободному месту
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    futures = [
+                        executor.submit(self.process_video, index, video_info, len(videos_to_process))
+                        for index, video_info in enumerate(videos_to_process)
+                    ]
+                    results = [future.result() for future in futures]
+                processed_videos = [result for result in results if result]
+            else:
+                # Обрабатываем каждое видео
+                for index, video_info in enumerate(videos_to_process):
+                    result = self.process_video(index, video_info, len(videos_to_process))
+                    if result:
+                        processed_videos.append(result)
+                    
+                    # Делаем небольшую паузу между обработкой видео
+                    if index < len(videos_to_process) - 1:
+                        print("⏳ Пауза перед обработкой следующего видео...")
+                        time.sleep(2)
             
             # Создаем итоговый отчет о всех обработанных видео
             summary_file = os.path.join(self.output_folder, "processing_summary.txt")
@@ -246,12 +166,247 @@ class VideoProcessor:
             traceback.print_exc()
             return False
     
+    def estimate_footprint(self, duration, source_bitrate, background_cached):
+        """Оценивает пиковое место на диске для одного видео"""
+        # Размер фона до скачивания неизвестен, считаем его сопоставимым с основным видео
+        background_bytes = 0 if background_cached else int(duration * source_bitrate / 8)
+        return estimate_job_footprint(duration, source_bitrate, background_bytes, hls=self.package_hls)
+    
+    def report_usage(self, video_index, intermediates, video_folder):
+        """Сообщает планировщику, сколько места задание уже занимает на диске"""
+        self.scheduler.report_usage(video_index, paths_size(intermediates.remaining() + [video_folder]))
+    
+    def process_video(self, index, video_info, total):
+        """
+        Обрабатывает одно видео после допуска планировщиком по свободному месту
+        
+        Returns:
+            dict: Информация об обработанном видео или None, если обработка не удалась
+        """
+        video_index = f"{index+1:02d}"
+        background_cached = (
+            not self.background_playlist_url
+            and self.render_cache.has_background_strip(self.background_video_url, self.layout.background)
+        )
+        # До скачивания оцениваем место по метаданным канала или отдельному запросу метаданных
+        duration = video_info.get('duration')
+        filesize = video_info.get('filesize_approx')
+        # При одном потоке задание допускается всегда, и лишний запрос метаданных не нужен:
+        # резерв уточнится после скачивания
+        if not duration and self.max_workers > 1:
+            try:
+                metadata = get_video_metadata(video_info['url'])
+                duration = metadata['duration']
+                filesize = metadata['filesize_approx']
+            except Exception as e:
+                print(f"⚠️ Не удалось получить метаданные видео {video_index}: {e}")
+        duration = duration or DEFAULT_DURATION
+        source_bitrate = int(filesize * 8 / duration) if filesize else DEFAULT_SOURCE_BITRATE
+        estimate = self.estimate_footprint(duration, source_bitrate, background_cached)
+        self.scheduler.admit(video_index, estimate)
+        
+        intermediates = IntermediateFiles()
+        try:
+            return self._process_video(index, video_info, total, intermediates)
+        finally:
+            # Удаляем все, что осталось, например после ошибки на одном из этапов
+            self.cleanup(intermediates.remaining() + [f"audio_{video_index}.aac"])
+            self.render_cache.unpin(video_index)
+            self.scheduler.release(video_index)
+    
+    def _process_video(self, index, video_info, total, intermediates):
+        print(f"\n{'='*50}")
+        print(f"🎬 Обработка видео {index+1}/{total}: {video_info.get('title', 'Без названия')}")
+        print(f"{'='*50}\n")
+        
+        # Создаем уникальные имена файлов для каждого видео
+        video_index = f"{index+1:02d}"
+        main_video_file = f"downloaded_main_{video_index}.mp4"
+        subtitles_file = f"subtitles_{video_index}.srt"
+        subtitles_video = f"main_with_subtitles_{video_index}.mp4"
+        final_with_subtitles = f"final_with_subtitles_{video_index}.mp4"
+        
+        # Каждый промежуточный файл удаляется сразу после последнего этапа, который его читает
+        intermediates.add(main_video_file, "subtitles", "burn_subtitles")
+        intermediates.add(subtitles_file, "burn_subtitles")
+        intermediates.add(subtitles_video, "combine")
+        intermediates.add(final_with_subtitles, "combine")
+        
+        # Создаем отдельную папку для каждого видео
+        video_folder = os.path.join(self.output_folder, f"video_{video_index}")
+        os.makedirs(video_folder, exist_ok=True)
+        
+        # Шаг 1: Скачивание видео
+        print(f"🔻 Скачивание видео {video_index}...")
+        main_video_file, video_details = download_youtube_video(video_info['url'], main_video_file)
+        
+        # Получаем полную информацию о видео
+        video_title = video_details.get('title', video_info.get('title', 'Без названия'))
+        video_description = video_details.get('description', video_info.get('description', ''))
+        video_uploader = video_details.get('uploader', video_info.get('uploader', 'Неизвестный автор'))
+        video_id = video_details.get('id', video_info.get('id', ''))
+        
+        # Создаем безопасное имя для папки с видео (удаляем недопустимые символы)
+        safe_title = ''.join(c for c in video_title if c.isalnum() or c in ' _-')
+        safe_title = safe_title.strip()
+        if len(safe_title) > 50:  # Ограничиваем длину имени папки
+            safe_title = safe_title[:50]
+        
+        # Создаем именованную папку для конкретного видео внутри video_XX
+        parts_folder = os.path.join(video_folder, f"{safe_title}")
+        os.makedirs(parts_folder, exist_ok=True)
+        
+        print(f"✅ Видео загружено: {main_video_file}")
+        
+        # Выбор фонового видео из плейлиста, если предоставлен URL плейлиста
+        if self.background_playlist_url and not self.background_video_url:
+            background_video_url = get_random_video_from_playlist(self.background_playlist_url)
+            if not background_video_url:
+                print("❌ Не удалось получить видео из плейлиста")
+                return None
+        else:
+            background_video_url = self.background_video_url
+        
+        background_video_file = f"downloaded_background_{video_index}.mp4"
+        background_cached = self.render_cache.has_background_strip(background_video_url, self.layout.background)
+        
+        # Уточняем резерв места по фактическому битрейту и длительности скачанного видео
+        main_info = get_video_info(main_video_file)
+        self.report_usage(video_index, intermediates, video_folder)
+        self.scheduler.update(video_index, self.estimate_footprint(
+            main_info['duration'], parse_bitrate(main_info['bitrate']), background_cached
+        ))
+        
+        # Полоса закрепляется до завершения композиции, чтобы параллельное задание
+        # не вытеснило ее из кэша после удаления скачанного фона
+        self.render_cache.pin_background(background_video_url, self.layout.background, video_index)
+        
+        # Фон скачивается и сразу превращается в полосу под блокировкой по URL: параллельное
+        # задание с тем же фоном дождется полосы и не будет скачивать его повторно
+        with self.render_cache.background_lock(background_video_url, self.layout.background):
+            if self.render_cache.has_background_strip(background_video_url, self.layout.background):
+                # Полоса уже подготовлена, повторно скачивать фон не нужно
+                print("♻️ Фоновое видео уже подготовлено, скачивание пропущено")
+            else:
+                print("🔻 Скачивание фонового видео...")
+                background_video_file, _ = download_youtube_video(background_video_url, background_video_file)
+                intermediates.add(background_video_file, "background_strip")
+                print(f"✅ Фоновое видео загружено: {background_video_file}")
+                self.report_usage(video_index, intermediates, video_folder)
+                self.render_cache.background_strip(
+                    background_video_file, self.layout.background, key=background_video_url
+                )
+                intermediates.stage_done("background_strip")
+        
+        # Шаг 2: Генерация субтитров
+        print("🔊 Генерация субтитров...")
+        subtitles_file = generate_subtitles(main_video_file, subtitles_file)
+        print(f"✅ Субтитры созданы: {subtitles_file}")
+        intermediates.stage_done("subtitles")
+        self.report_usage(video_index, intermediates, video_folder)
+        
+        # Сохраняем копию субтитров в папку видео
+        subtitles_copy = os.path.join(video_folder, "subtitles.srt")
+        with open(subtitles_file, 'r', encoding='utf-8') as src, open(subtitles_copy, 'w', encoding='utf-8') as dst:
+            dst.write(src.read())
+        
+        # Ранжируем хештеги по TF-IDF относительно корпуса канала
+        transcript = read_srt_text(subtitles_file) if self.hashtags_from_transcript else None
+        with self.corpus_lock:
+            ranked = self.hashtag_corpus.process_video(
+                video_id or video_info['url'], video_title, video_description, transcript=transcript
+            )
+        hashtags = hashtags_from_ranking(ranked)
+        
+        print(f"\n{'*'*50}")
+        print(f"📋 ИНФОРМАЦИЯ О ВИДЕО {video_index}:")
+        print(f"{'*'*50}")
+        print(f"🏷️ Название: {video_title}")
+        print(f"👤 Автор: {video_uploader}")
+        print(f"🔖 Рекомендуемые хештеги: {' '.join(hashtags)}")
+        print(f"{'*'*50}\n")
+        
+        # Сохраняем информацию о видео в лог-файл в папке видео
+        log_file = os.path.join(video_folder, "video_info.txt")
+        with open(log_file, 'w', encoding='utf-8') as f:
+            f.write(f"ИНФОРМАЦИЯ О ВИДЕО {video_index}\n")
+            f.write(f"{'='*50}\n")
+            f.write(f"Название: {video_title}\n")
+            f.write(f"Автор: {video_uploader}\n")
+            f.write(f"URL: {video_info['url']}\n")
+            f.write(f"ID: {video_id}\n\n")
+            f.write(f"ОПИСАНИЕ:\n{video_description}\n\n")
+            f.write(f"РЕКОМЕНДУЕМЫЕ ХЕШТЕГИ:\n{' '.join(hashtags)}\n")
+        
+        # Шаг 3: Добавление субтитров к основному видео
+        print("🎬 Добавление субтитров к видео...")
+        subtitles_video = add_subtitles_to_video(
+            main_video_file, 
+            subtitles_file, 
+            subtitles_video,
+            style=self.layout.subtitle_style
+        )
+        print(f"✅ Видео с субтитрами создано: {subtitles_video}")
+        intermediates.stage_done("burn_subtitles")
+        self.report_usage(video_index, intermediates, video_folder)
+        
+        # Обложки и контактный лист собираются в том же проходе, что и композиция
+        preview = None
+        if self.previews:
+            try:
+                preview = PreviewSampler(
+                    self.layout.width, self.layout.height, main_info['duration'], segment_time=self.segment_time
+                )
+            except ImportError:
+                print("⚠️ NumPy не установлен, обложки и контактный лист не будут созданы")
+        
+        # Шаг 4: Объединение видео
+        print("🛠️ Объединение видео...")
+        final_with_subtitles = combine_videos(
+            subtitles_video,
+            # Фоновая полоса уже в кэше, исходное фоновое видео не нужно
+            None,
+            final_with_subtitles,
+            layout=self.layout,
+            cache=self.render_cache,
+            background_key=background_video_url,
+            keyframe_interval=self.segment_time,
+            preview=preview
+        )
+        print(f"✅ Объединенное видео создано: {final_with_subtitles}")
+        
+        # Переносим полное видео в папку видео вместо копирования, чтобы не держать две копии
+        full_video = os.path.join(video_folder, "full_video.mp4")
+        shutil.move(final_with_subtitles, full_video)
+        intermediates.stage_done("combine")
+        self.render_cache.unpin(video_index)
+        self.report_usage(video_index, intermediates, video_folder)
+        
+        # Шаг 5: Разбиение на части
+        print("✂️ Разбиение на части...")
+        output_parts_folder, manifest = split_video(full_video, parts_folder, segment_time=self.segment_time, hls=self.package_hls)
+        print(f"✅ Нарезки сохранены в папке: {output_parts_folder}")
+        
+        if preview:
+            preview.write_previews(parts_folder, manifest['parts'])
+        
+        # Добавляем информацию о хештегах в отдельные файлы (текстовый и JSON) в папке с нарезками
+        write_hashtag_files(parts_folder, video_index, video_title, video_id, ranked, self.hashtag_corpus)
+        
+        # Сохраняем информацию об обработанном видео
+        return {
+            'index': video_index,
+            'title': video_title,
+            'folder': video_folder,
+            'parts_folder': parts_folder
+        }
+    
     def cleanup(self, files_to_remove):
         """Удаляет временные файлы после обработки, оставляя только нарезанные видео"""
         print("🧹 Очистка временных файлов...")
         
         for file in files_to_remove:
-            if os.path.exists(file):
+            if file and os.path.exists(file):
                 try:
                     os.remove(file)
                     print(f"  ✓ Удален файл: {file}")
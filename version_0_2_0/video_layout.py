@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+
+"""
+Декларативное описание холста 9:16 и кэш заранее подготовленных элементов.
+
+Раскладка описывает области холста (основное видео, фон), статичные
+наложения (водяной знак, титульная карточка) и стиль зоны субтитров.
+Переиспользуемые элементы - обрезанная под область фоновая полоса и
+масштабированные PNG - готовятся один раз и кэшируются на диске по
+параметрам, так что при рендере каждого видео перекодируется только
+основное видео.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import threading
+import subprocess
+
+DEFAULT_SUBTITLE_STYLE = "Fontsize=24,PrimaryColour=&HFFFFFF&,Alignment=2"
+
+class Region:
+    """
+    Прямоугольная область холста
+    
+    Args:
+        x (int): Смещение по горизонтали
+        y (int): Смещение по вертикали
+        width (int): Ширина области
+        height (int): Высота области
+        fit (str): "cover" - масштабирование с заполнением и обрезкой,
+            "height" - масштабирование по высоте с центрированием (обрезка или поля по ширине)
+    """
+    def __init__(self, x, y, width, height, fit="cover"):
+        if fit not in ("cover", "height"):
+            raise ValueError(f"Неизвестный режим вписывания: {fit}")
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.fit = fit
+    
+    def scale_filter(self):
+        """Возвращает цепочку фильтров ffmpeg, приводящую кадр к размеру области"""
+        if self.fit == "cover":
+            return (
+                f"scale={self.width}:{self.height}:force_original_aspect_ratio=increase,"
+                f"crop={self.width}:{self.height}:(iw-ow)/2:(ih-oh)/2"
+            )
+        return (
+            f"scale=-2:{self.height},"
+            f"crop=w='min(iw,{self.width})':h={self.height},"
+            f"pad={self.width}:{self.height}:(ow-iw)/2:0"
+        )
+    
+    def to_dict(self):
+        return {'x': self.x, 'y': self.y, 'width': self.width, 'height': self.height, 'fit': self.fit}
+
+class Overlay:
+    """
+    Статичное PNG-наложение (водяной знак, титульная карточка)
+    
+    Args:
+        image (str): Путь к PNG файлу
+        x (int): Смещение по горизонтали на холсте
+        y (int): Смещение по вертикали на холсте
+        width (int): Ширина после масштабирования (None - исходный размер)
+        start (float): Время появления в секундах (None - с начала)
+        end (float): Время исчезновения в секундах (None - до конца)
+    """
+    def __init__(self, image, x=0, y=0, width=None, start=None, end=None):
+        self.image = image
+        self.x = x
+        self.y = y
+        self.width = width
+        self.start = start
+        self.end = end
+    
+    def enable_expression(self):
+        """Возвращает выражение enable для фильтра overlay или None"""
+        if self.start is None and self.end is None:
+            return None
+        start = self.start if self.start is not None else 0
+        if self.end is None:
+            return f"gte(t,{start})"
+        return f"between(t,{start},{self.end})"
+
+class CanvasLayout:
+    """
+    Раскладка итогового видео
+    
+    Args:
+        width (int): Ширина холста
+        height (int): Высота холста
+        main (Region): Область основного видео
+        background (Region): Область фонового видео
+        overlays (list): Список Overlay, накладываются поверх в указанном порядке
+        subtitle_style (str): Значение force_style для фильтра subtitles
+    """
+    def __init__(self, width, height, main, background, overlays=None, subtitle_style=DEFAULT_SUBTITLE_STYLE):
+        self.width = width
+        self.height = height
+        self.main = main
+        self.background = background
+        self.overlays = list(overlays or [])
+        self.subtitle_style = subtitle_style
+
+def default_layout(width=1080, height=1920, overlays=None):
+    """
+    Стандартная раскладка для TikTok: основное видео сверху на 1/3 высоты,
+    фоновое видео занимает оставшуюся часть снизу
+    """
+    main_height = int(height / 3)
+    return CanvasLayout(
+        width, height,
+        main=Region(0, 0, width, main_height, fit="height"),
+        background=Region(0, main_height, width, height - main_height, fit="cover"),
+        overlays=overlays
+    )
+
+def file_fingerprint(path, chunk_size=1024 * 1024):
+    """
+    Быстрый отпечаток файла: размер и хеш первого и последнего мегабайта.
+    Не зависит от имени файла, поэтому повторно скачанное видео дает тот же отпечаток.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(chunk_size))
+        if size > chunk_size:
+            f.seek(max(size - chunk_size, chunk_size))
+            digest.update(f.read(chunk_size))
+    return digest.hexdigest()
+
+def _temp_path(path):
+    """Уникальное имя временного файла, чтобы параллельные задания не писали в один файл"""
+    root, extension = os.path.splitext(path)
+    return f"{root}.{os.getpid()}_{threading.get_ident()}.tmp{extension}"
+
+class RenderCache:
+    """
+    Дисковый кэш подготовленных элементов раскладки
+    
+    По умолчанию фоновая полоса кодируется из всего исходного фона, так что при
+    рендере фон зацикливается (-stream_loop) только если он короче основного видео.
+    strip_duration ограничивает длину полосы ценой повторения фона каждые
+    strip_duration секунд. Когда размер кэша превышает max_bytes, удаляются давно
+    не использованные элементы.
+    
+    Args:
+        cache_folder (str): Папка для хранения кэша
+        strip_duration (int): Максимальная длительность фоновой полосы в секундах (None - без ограничения)
+        max_bytes (int): Максимальный размер кэша в байтах
+    """
+    def __init__(self, cache_folder="render_cache", strip_duration=None, max_bytes=10 * 1024 ** 3):
+        self.cache_folder = cache_folder
+        self.strip_duration = strip_duration
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_folder, exist_ok=True)
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        # Закрепленные элементы: путь -> задания, которым он еще нужен; вытеснение их не трогает
+        self._pins = {}
+        self._pins_lock = threading.Lock()
+    
+    def pin_background(self, key, region, owner):
+        """
+        Закрепляет фоновую полосу за заданием, чтобы ее не вытеснили до композиции.
+        Закрепить можно и еще не подготовленную полосу.
+        """
+        strip = self._background_path(key, region)
+        with self._pins_lock:
+            self._pins.setdefault(strip, set()).add(owner)
+        return strip
+    
+    def unpin(self, owner):
+        """Снимает все закрепления задания"""
+        with self._pins_lock:
+            for path, owners in list(self._pins.items()):
+                owners.discard(owner)
+                if not owners:
+                    del self._pins[path]
+    
+    def background_lock(self, key, region):
+        """
+        Блокировка подготовки фоновой полосы для ключа, чтобы параллельные задания
+        с одним фоновым видео не скачивали и не кодировали его дважды
+        """
+        strip = self._background_path(key, region)
+        with self._locks_lock:
+            return self._locks.setdefault(strip, threading.RLock())
+    
+    def _path(self, kind, params, extension):
+        key = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+        return os.path.join(self.cache_folder, f"{kind}_{key}{extension}")
+    
+    def _background_path(self, key, region):
+        params = {'source': key, 'region': region.to_dict(), 'duration': self.strip_duration}
+        return self._path("background", params, ".mp4")
+    
+    def _touch(self, path):
+        # Время изменения используется как время последнего обращения для вытеснения
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+    
+    def evict(self, keep=None):
+        """
+        Удаляет давно не использованные элементы, пока кэш не уложится в max_bytes
+        
+        Args:
+            keep (str): Элемент, который нельзя удалять (только что подготовленный)
+            
+        Returns:
+            list: Удаленные файлы
+        """
+        entries = []
+        for name in os.listdir(self.cache_folder):
+            path = os.path.join(self.cache_folder, name)
+            if os.path.isfile(path) and ".tmp" not in name:
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        with self._pins_lock:
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                if path == keep or path in self._pins:
+                    continue
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                removed.append(path)
+                print(f"  🧹 Удален из кэша: {path}")
+        return removed
+    
+    def has_background_strip(self, key, region):
+        """Проверяет, есть ли в кэше фоновая полоса для указанного ключа (и обновляет время обращения)"""
+        if key is None:
+            return False
+        strip = self._background_path(key, region)
+        if not os.path.exists(strip):
+            return False
+        self._touch(strip)
+        return True
+    
+    def background_strip(self, background_video, region, key=None):
+        """
+        Возвращает фоновую полосу, обрезанную под область, готовя ее при первом обращении.
+        Звук удаляется: в итоговом видео используется звук основного видео.
+        
+        Args:
+            background_video (str): Путь к фоновому видео (может быть None, если полоса уже в кэше)
+            region (Region): Область фона на холсте
+            key (str): Ключ источника, например URL (по умолчанию - отпечаток файла)
+            
+        Returns:
+            str: Путь к подготовленной полосе
+            
+        Raises:
+            FileNotFoundError: Если полосы нет в кэше, а фоновое видео не передано
+        """
+        if background_video is None and not self.has_background_strip(key, region):
+            raise FileNotFoundError(f"Фоновая полоса для {key} отсутствует в кэше, а фоновое видео не передано")
+        if key is None:
+            key = file_fingerprint(background_video)
+        strip = self._background_path(key, region)
+        with self.background_lock(key, region):
+            if os.path.exists(strip):
+                print(f"  ♻️ Используем подготовленную фоновую полосу: {strip}")
+                self._touch(strip)
+                return strip
+            
+            print(f"  📐 Подготавливаем фоновую полосу {region.width}x{region.height}")
+            # Ограничение длины задается до -i, чтобы ffmpeg не читал остаток фона
+            limit = ["-t", str(self.strip_duration)] if self.strip_duration else []
+            temp_strip = _temp_path(strip)
+            subprocess.run([
+                "ffmpeg", *limit, "-i", background_video,
+                "-vf", region.scale_filter(),
+                "-an", "-c:v", "libx264", "-crf", "28", "-preset", "fast",
+                "-y", temp_strip
+            ], check=True)
+            # Переименование после завершения, чтобы в кэш не попал недописанный файл
+            os.replace(temp_strip, strip)
+            self.evict(keep=strip)
+            return strip
+    
+    def overlay_image(self, overlay):
+        """
+        Возвращает PNG наложения, масштабированный до нужной ширины
+        
+        Args:
+            overlay (Overlay): Описание наложения
+            
+        Returns:
+            str: Путь к подготовленному PNG
+        """
+        if overlay.width is None:
+            return overlay.image
+        params = {'source': file_fingerprint(overlay.image), 'width': overlay.width}
+        image = self._path("overlay", params, ".png")
+        if not os.path.exists(image):
+            print(f"  🖼️ Подготавливаем наложение {overlay.image} (ширина: {overlay.width}px)")
+            temp_image = _temp_path(image)
+            subprocess.run([
+                "ffmpeg", "-i", overlay.image, "-vf", f"scale={overlay.width}:-1",
+                "-y", temp_image
+            ], check=True)
+            os.replace(temp_image, image)
+            self.evict(keep=image)
+        else:
+            self._touch(image)
+        return image
+    
+    def clear(self):
+        """Удаляет все подготовленные элементы"""
+        shutil.rmtree(self.cache_folder, ignore_errors=True)
+        os.makedirs(self.cache_folder, exist_ok=True)
+
+def build_composition_command(main_video, background_strip, overlay_images, layout, output_file,
+                              frame_rate=None, keyframe_interval=None, preview=None):
+    """
+    Формирует команду ffmpeg для рендера одного видео по раскладке
+    
+    Args:
+        main_video (str): Путь к основному видео
+        background_strip (str): Путь к подготовленной фоновой полосе
+        overlay_images (list): Пути к подготовленным PNG в порядке layout.overlays
+        layout (CanvasLayout): Раскладка холста
+        output_file (str): Путь к итоговому видео
+        frame_rate (str): Частота кадров основного видео; фон приводится к ней, так как
+            первый вход overlay определяет частоту кадров результата
+        keyframe_interval (int): Принудительно ставить ключевые кадры с этим шагом в секундах,
+            чтобы последующая нарезка без перекодирования резала точно по границам частей
+        preview (PreviewSampler): Дополнительная ветка кадров предпросмотра в stdout
+        
+    Returns:
+        list: Аргументы командной строки ffmpeg
+    """
+    main = layout.main
+    background = layout.background
+    
+    command = ["ffmpeg", "-i", main_video, "-stream_loop", "-1", "-i", background_strip]
+    for image in overlay_images:
+        command += ["-i", image]
+    
+    # Фоновая полоса уже нужного размера, ее достаточно разместить на холсте;
+    # масштабируется только основное видео. Зацикленный фон обрезается по длине основного
+    background_fps = f"fps={frame_rate}," if frame_rate else ""
+    filters = [
+        f"[1:v]{background_fps}pad={layout.width}:{layout.height}:{background.x}:{background.y}[base]",
+        f"[0:v]{main.scale_filter()}[main]",
+        f"[base][main]overlay={main.x}:{main.y}:shortest=1[v0]",
+    ]
+    for index, overlay in enumerate(layout.overlays):
+        options = f"{overlay.x}:{overlay.y}"
+        enable = overlay.enable_expression()
+        if enable:
+            options += f":enable='{enable}'"
+        filters.append(f"[v{index}][{index + 2}:v]overlay={options}[v{index + 1}]")
+    
+    video_label = f"v{len(layout.overlays)}"
+    if preview:
+        # Кадры для предпросмотра берутся из того же декодирования, что и композиция
+        filters.append(f"[{video_label}]split=2[vout][vpreview]")
+        filters.append(f"[vpreview]{preview.filter_chain()}[preview]")
+        video_label = "vout"
+    
+    command += [
+        "-filter_complex", ";".join(filters),
+        "-map", f"[{video_label}]", "-map", "0:a?",
+        "-c:v", "libx264", "-crf", "28", "-preset", "fast", "-c:a", "copy",
+    ]
+    if keyframe_interval:
+        command += ["-force_key_frames", f"expr:gte(t,n_forced*{keyframe_interval})"]
+    command += [
+        "-movflags", "+faststart",
+        "-aspect", f"{layout.width}:{layout.height}", "-y", output_file
+    ]
+    if preview:
+        command += ["-map", "[preview]"] + preview.output_args()
+    return command
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+
+"""
+Упаковка нарезок для загрузки и потокового воспроизведения.
+
+Манифест частей строится по списку сегментов, который ffmpeg записывает
+во время нарезки, поэтому повторно анализировать каждую часть через
+ffprobe не нужно.
+"""
+
+import os
+import csv
+import json
+import hashlib
+import subprocess
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    """
+    Считает SHA-256 файла, читая его блоками
+    
+    Args:
+        path (str): Путь к файлу
+        chunk_size (int): Размер блока чтения
+        
+    Returns:
+        str: Шестнадцатеричный хеш
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_segment_list(segment_list_file):
+    """
+    Читает CSV список сегментов ffmpeg (-segment_list_type csv)
+    
+    Args:
+        segment_list_file (str): Путь к CSV файлу
+        
+    Returns:
+        list: Кортежи (имя файла, начало, конец) в секундах относительно исходного видео
+    """
+    segments = []
+    with open(segment_list_file, 'r', encoding='utf-8', newline='') as f:
+        for row in csv.reader(f):
+            if len(row) >= 3:
+                segments.append((row[0], float(row[1]), float(row[2])))
+    return segments
+
+def build_parts_manifest(output_folder, segments):
+    """
+    Собирает описание частей: длительности, размеры, контрольные суммы
+    и смещения ключевых кадров в исходном видео
+    
+    Args:
+        output_folder (str): Папка с частями
+        segments (list): Результат read_segment_list
+        
+    Returns:
+        list: Словари с описанием частей
+    """
+    parts = []
+    for index, (filename, start, end) in enumerate(segments):
+        part_path = os.path.join(output_folder, filename)
+        parts.append({
+            'index': index + 1,
+            'file': filename,
+            # При нарезке без перекодирования каждая часть начинается с ключевого кадра,
+            # поэтому начало части совпадает со смещением ключевого кадра в исходном видео
+            'keyframe_offset': round(start, 3),
+            'end': round(end, 3),
+        'duration': round(end - start, 3),
+            'size_bytes': os.path.getsize(part_path),
+            'sha256': file_checksum(part_path),
+            'faststart': True
+        })
+    return parts
+
+def package_hls(video_file, output_folder, segment_time=6):
+    """
+    Упаковывает видео в HLS (fMP4 сегменты и VOD плейлист) без перекодирования
+    
+    Args:
+        video_file (str): Путь к видео
+        output_folder (str): Папка для плейлиста и сегментов
+        segment_time (int): Целевая длительность сегмента в секундах
+        
+    Returns:
+        str: Путь к плейлисту
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    print("📦 Упаковка видео в HLS...")
+    playlist = os.path.join(output_folder, "playlist.m3u8")
+    subprocess.run([
+        "ffmpeg", "-i", video_file, "-c", "copy", "-map", "0",
+        "-f", "hls", "-hls_time", str(segment_time), "-hls_playlist_type", "vod",
+        "-hls_segment_type", "fmp4", "-hls_fmp4_init_filename", "init.mp4",
+        "-hls_segment_filename", os.path.join(output_folder, "segment_%03d.m4s"),
+        "-y", playlist
+    ], check=True)
+    return playlist
+
+def write_manifest(manifest_file, video_file, video_info, segment_time, parts, hls_playlist=None):
+    """
+    Записывает JSON манифест нарезки
+    
+    Args:
+        manifest_file (str): Путь к манифесту
+        video_file (str): Исходное видео
+        video_info (dict): Результат get_video_info для исходного видео
+        segment_time (int): Целевая длительность части
+        parts (list): Результат build_parts_manifest
+        hls_playlist (str): Путь к HLS плейлисту, если пакет создавался
+        
+    Returns:
+        dict: Записанный манифест
+    """
+    manifest_folder = os.path.dirname(manifest_file)
+    manifest = {
+        'source': os.path.basename(video_file),
+        'width': video_info['width'],
+        'height': video_info['height'],
+        'duration': round(video_info['duration'], 3),
+        'segment_time': segment_time,
+        'parts': parts,
+        'hls': os.path.relpath(hls_playlist, manifest_folder) if hls_playlist else None
+    }
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+"""
+Обложки частей и контактный лист, собранные в том же проходе декодирования,
+что и композиция видео.
+
+Итоговый кадр композиции дополнительно уменьшается и передается через pipe
+в сыром виде; кадры оцениваются по резкости и яркости с помощью NumPy,
+и для каждой части и каждой ячейки контактного листа сохраняется лучший кадр.
+Отдельного полного декодирования видео не требуется.
+"""
+
+import os
+import subprocess
+
+class PreviewSampler:
+    """
+    Отбор кадров для обложек и контактного листа
+    
+    Args:
+        canvas_width (int): Ширина итогового видео
+        canvas_height (int): Высота итогового видео
+        duration (float): Длительность итогового видео в секундах
+        segment_time (int): Длительность части, как при нарезке split_video
+        scale (int): Во сколько раз уменьшать кадр для обложек
+        interval (float): Интервал между анализируемыми кадрами в секундах
+        sheet_columns (int): Количество столбцов контактного листа
+        sheet_rows (int): Количество строк контактного листа
+    """
+    def __init__(self, canvas_width, canvas_height, duration, segment_time=120, scale=4,
+                 interval=1.0, sheet_columns=4, sheet_rows=4):
+        # NumPy нужен только для предпросмотра; проверяем его наличие до запуска композиции
+        import numpy  # noqa: F401
+        
+        # Размеры кадра должны быть четными для yuv420p при последующем кодировании в JPEG
+        self.width = canvas_width // scale // 2 * 2
+        self.height = canvas_height // scale // 2 * 2
+        self.duration = duration
+        self.segment_time = segment_time
+        self.interval = interval
+        self.sheet_columns = sheet_columns
+        self.sheet_rows = sheet_rows
+        self.sheet_bucket = max(duration / (sheet_columns * sheet_rows), interval)
+        
+        # Лучшие кадры: индекс окна -> (оценка, время, кадр)
+        self.part_frames = {}
+        self.sheet_frames = {}
+    
+    def filter_chain(self):
+        """Цепочка фильтров ffmpeg для ветки предпросмотра"""
+        return f"fps=1/{self.interval},scale={self.width}:{self.height},format=rgb24"
+    
+    def output_args(self):
+        """Аргументы ffmpeg для вывода кадров предпросмотра в stdout"""
+        return ["-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"]
+    
+    def add_frame(self, timestamp, frame):
+        """Оценивает кадр и запоминает его, если он лучший в своем окне"""
+        score = score_frame(frame)
+        for frames, window in (
+            (self.part_frames, int(timestamp // self.segment_time)),
+            (self.sheet_frames, int(timestamp // self.sheet_bucket))
+        ):
+            best = frames.get(window)
+            if best is None or score > best[0]:
+                frames[window] = (score, timestamp, frame)
+    
+    def run(self, command):
+        """
+        Запускает ffmpeg и анализирует кадры предпросмотра по мере декодирования
+        
+        Args:
+            command (list): Команда ffmpeg, выводящая кадры предпросмотра в stdout
+            
+        Raises:
+            subprocess.CalledProcessError: Если ffmpeg завершился с ошибкой
+        """
+        import numpy as np
+        
+        frame_size = self.width * self.height * 3
+        process = subprocess.Popen(command, stdout=subprocess.PIPE)
+        index = 0
+        try:
+            while True:
+                data = process.stdout.read(frame_size)
+                if len(data) < frame_size:
+                    break
+                frame = np.frombuffer(data, dtype=np.uint8).reshape(self.height, self.width, 3)
+                self.add_frame(index * self.interval, frame)
+                index += 1
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+        if returncode != 0:
+            raise subprocess.CalledProcessError(returncode, command)
+        print(f"  🖼️ Проанализировано кадров для предпросмотра: {index}")
+    
+    def contact_sheet(self):
+        """Собирает контактный лист из лучших кадров (пустые ячейки - черные)"""
+        import numpy as np
+        
+        blank = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        rows = []
+        for row in range(self.sheet_rows):
+            cells = []
+            for column in range(self.sheet_columns):
+                best = self.sheet_frames.get(row * self.sheet_columns + column)
+                cells.append(best[2] if best else blank)
+            rows.append(np.concatenate(cells, axis=1))
+        return np.concatenate(rows, axis=0)
+    
+    def write_previews(self, parts_folder, parts):
+        """
+        Записывает обложку для каждой части и контактный лист
+        
+        Args:
+            parts_folder (str): Папка с частями
+            parts (list): Описание частей из манифеста (file, keyframe_offset)
+            
+        Returns:
+            list: Пути к созданным изображениям
+        """
+        if not self.part_frames:
+            print("⚠️ Нет кадров для предпросмотра, обложки не созданы")
+            return []
+        
+        created = []
+        for part in parts:
+            # Границы частей совпадают с окнами, так как ключевые кадры расставлены по segment_time
+            best = self.part_frames.get(int(round(part['keyframe_offset'] / self.segment_time)))
+            if best is None:
+                continue
+            thumbnail = os.path.join(parts_folder, os.path.splitext(part['file'])[0] + ".jpg")
+            write_image(best[2], thumbnail)
+            created.append(thumbnail)
+        
+        sheet_file = os.path.join(parts_folder, "contact_sheet.jpg")
+        write_image(self.contact_sheet(), sheet_file)
+        created.append(sheet_file)
+        
+        print(f"✅ Создано обложек: {len(created) - 1}, контактный лист: {sheet_file}")
+        return created
+
+def score_frame(frame, step=4):
+    """
+    Дешевая оценка кадра: энергия градиента (резкость), умноженная на
+    штраф за слишком темный или пересвеченный кадр
+    
+    Args:
+        frame (numpy.ndarray): Кадр HxWx3 uint8
+        step (int): Шаг прореживания кадра перед оценкой
+        
+    Returns:
+        float: Оценка кадра (больше - лучше)
+    """
+    import numpy as np
+    
+    gray = frame[::step, ::step].mean(axis=2, dtype=np.float32)
+    sharpness = np.abs(np.diff(gray, axis=0)).mean() + np.abs(np.diff(gray, axis=1)).mean()
+    brightness = gray.mean() / 255
+    exposure = max(0.0, 1 - abs(brightness - 0.5) * 2)
+    return float(sharpness * exposure)
+
+def write_image(frame, output_file):
+    """Кодирует кадр RGB в JPEG через ffmpeg"""
+    height, width = frame.shape[:2]
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-f", "rawvideo", "-pix_fmt", "rgb24",
+        "-s", f"{width}x{height}", "-i", "-", "-frames:v", "1", "-q:v", "2",
+        "-y", output_file
+    ], input=frame.tobytes(), check=True)
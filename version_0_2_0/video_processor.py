@@ -1,13 +1,22 @@
 import os
 import subprocess
-import whisper
+from video_packaging import build_parts_manifest, package_hls, read_segment_list, write_manifest
+from video_layout import DEFAULT_SUBTITLE_STYLE, RenderCache, build_composition_command, default_layout
 
-def get_video_duration(video_file):
+def get_video_frame_rate(video_file):
+    """
+    Возвращает частоту кадров видео в виде дроби ffprobe (например, "30000/1001")
+    или None, если ее не удалось определить
+    """
     result = subprocess.run(
-        ["ffprobe", "-i", video_file, "-show_entries", "format=duration", "-v", "quiet", "-of", "csv=p=0"],
+        ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=r_frame_rate",
+         "-of", "csv=p=0", video_file],
         capture_output=True, text=True
     )
-    return float(result.stdout.strip())
+    frame_rate = result.stdout.strip()
+    if not frame_rate or frame_rate.startswith("0/"):
+        return None
+    return frame_rate
 
 def get_video_info(video_file):
     """
@@ -96,36 +105,27 @@ def format_time(seconds):
     seconds = int(seconds % 60)
     return f"{hours:02}:{minutes:02}:{seconds:02}"
 
-def generate_subtitles(video_file, subtitles_file="subtitles.srt"):
-    print("🔊 Извлечение аудио из видео...")
-    audio_file = os.path.splitext(video_file)[0] + ".wav"
+def write_srt(segments, subtitles_file, chunk_size=3):
+    """
+    Записывает сегменты распознавания в SRT файл, разбивая каждый сегмент
+    на фрагменты по chunk_size слов
     
-    # Instead of trying to copy the audio codec, we'll convert it to WAV format
-    # which is well supported by whisper and ffmpeg
-    subprocess.run([
-        "ffmpeg", 
-        "-i", video_file, 
-        "-vn",            # No video
-        "-ar", "16000",   # Audio sample rate that whisper expects
-        "-ac", "1",       # Mono audio (1 channel)
-        "-c:a", "pcm_s16le",  # PCM 16-bit audio codec
-        "-y",             # Overwrite output file if it exists
-        audio_file
-    ])
-
-    print("📝 Распознавание речи...")
-    model = whisper.load_model("base")
-    result = model.transcribe(audio_file, fp16=False)
-
+    Args:
+        segments (list): Сегменты whisper со значениями text, start, end
+        subtitles_file (str): Путь к SRT файлу
+        chunk_size (int): Количество слов в одном субтитре
+        
+    Returns:
+        str: Путь к SRT файлу
+    """
     with open(subtitles_file, "w", encoding="utf-8") as f:
         index = 1
-        for segment in result["segments"]:
+        for segment in segments:
             words = segment["text"].split()
             start_time = segment["start"]
             end_time = segment["end"]
             duration = end_time - start_time
             
-            chunk_size = 3
             for i in range(0, len(words), chunk_size):
                 chunk = " ".join(words[i:i + chunk_size])
                 
@@ -140,167 +140,94 @@ def generate_subtitles(video_file, subtitles_file="subtitles.srt"):
                 f.write(f"{chunk}\n\n")
                 index += 1
     
+    return subtitles_file
+
+def generate_subtitles(video_file, subtitles_file="subtitles.srt"):
+    print("🔊 Извлечение аудио из видео...")
+    audio_file = os.path.splitext(video_file)[0] + ".wav"
+    
+    # Instead of trying to copy the audio codec, we'll convert it to WAV format
+    # which is well supported by whisper and ffmpeg
+    subprocess.run([
+        "ffmpeg", 
+        "-i", video_file, 
+        "-vn",            # No video
+        "-ar", "16000",   # Audio sample rate that whisper expects
+        "-ac", "1",       # Mono audio (1 channel)
+        "-c:a", "pcm_s16le",  # PCM 16-bit audio codec
+        "-y",             # Overwrite output file if it exists
+        audio_file
+    ])
+
+    print("📝 Распознавание речи...")
+    # whisper тянет за собой torch, поэтому импортируем его только здесь
+    import whisper
+    model = whisper.load_model("base")
+    result = model.transcribe(audio_file, fp16=False)
+
+    write_srt(result["segments"], subtitles_file)
+    
     # Удаляем временный аудио файл
     if os.path.exists(audio_file):
         os.remove(audio_file)
     
     return subtitles_file
 
-def add_subtitles_to_video(video_file, subtitles_file, output_file):
+def add_subtitles_to_video(video_file, subtitles_file, output_file, style=DEFAULT_SUBTITLE_STYLE):
     print("🎬 Накладываем субтитры...")
     subprocess.run([
         "ffmpeg", "-i", video_file, "-vf",
-        f"subtitles={subtitles_file}:force_style='Fontsize=24,PrimaryColour=&HFFFFFF&,Alignment=2'",
+        f"subtitles={subtitles_file}:force_style='{style}'",
         "-c:a", "copy", "-y", output_file
     ])
     return output_file
 
-def combine_videos(main_video, background_video, output_file):
-    print("🛠️ Объединяем видео в формате 9:16 для TikTok...")
+def combine_videos(main_video, background_video, output_file, layout=None, cache=None, background_key=None,
+                   keyframe_interval=None, preview=None):
+    """
+    Собирает итоговое видео по раскладке холста
     
-    try:
-        # Получаем длительность основного видео
-        main_duration = get_video_duration(main_video)
-        print(f"  📊 Длительность основного видео: {format_time(main_duration)}")
-        
-        # Получаем длительность фонового видео
-        bg_duration = get_video_duration(background_video)
-        print(f"  📊 Длительность фонового видео: {format_time(bg_duration)}")
-        
-        # Создаем временный файл для обработанного фонового видео
-        temp_bg_file = "temp_background.mp4"
-        
-        # Подготовка фонового видео по длительности
-        if abs(main_duration - bg_duration) < 1:
-            # Если длительности примерно одинаковые (разница меньше 1 секунды),
-            # используем фоновое видео как есть
-            print("  ✓ Длительности видео примерно совпадают, дополнительная обработка не требуется")
-            processed_bg = background_video
-        elif bg_duration > main_duration:
-            # Если фоновое видео длиннее основного, обрезаем его
-            print(f"  ✂️ Обрезаем фоновое видео до {format_time(main_duration)}")
-            subprocess.run([
-                "ffmpeg", "-i", background_video, "-t", str(main_duration),
-                "-c:v", "copy", "-c:a", "copy", "-y", temp_bg_file
-            ])
-            processed_bg = temp_bg_file
-        else:
-            # Если фоновое видео короче основного, зацикливаем его
-            print(f"  🔄 Удлиняем фоновое видео до {format_time(main_duration)}")
-            # Создаем список повторений для достижения необходимой длительности
-            repetitions = int(main_duration / bg_duration) + 1
-            print(f"  🔢 Требуется повторений: {repetitions}")
-            
-            # Создаем временный файл с инструкциями для concat демультиплексора
-            concat_file = "concat_list.txt"
-            with open(concat_file, "w") as f:
-                for _ in range(repetitions):
-                    f.write(f"file '{background_video}'\n")
-            
-            # Соединяем повторения
-            subprocess.run([
-                "ffmpeg", "-f", "concat", "-safe", "0", "-i", concat_file,
-                "-t", str(main_duration), "-c", "copy", "-y", temp_bg_file
-            ])
-            
-            # Удаляем временный файл со списком
-            if os.path.exists(concat_file):
-                os.remove(concat_file)
-            
-            processed_bg = temp_bg_file
-        
-        # Создаем более простой и надежный подход к объединению видео
-        print("  🔄 Создаем композицию в формате 9:16...")
-        
-        # Определяем размеры итогового видео (9:16)
-        output_width = 1080
-        output_height = 1920
-        
-        # Создаем временные файлы для масштабированных видео
-        temp_main_scaled = "temp_main_scaled.mp4"
-        temp_bg_scaled = "temp_bg_scaled.mp4"
-        
-        # 1. Масштабируем основное видео до 1/3 высоты (с сохранением пропорций)
-        main_target_height = int(output_height / 3)
-        print(f"  📐 Масштабируем основное видео (высота: {main_target_height}px)")
-        subprocess.run([
-            "ffmpeg", "-i", main_video,
-            "-vf", f"scale=-1:{main_target_height}",
-            "-c:a", "copy", "-y", temp_main_scaled
-        ], check=True)
-        
-        # Получаем информацию о размерах масштабированного основного видео
-        main_scaled_info = get_video_info(temp_main_scaled)
-        main_scaled_width = main_scaled_info['width']
-        main_scaled_height = main_scaled_info['height']
-        
-        print(f"  📏 Размеры масштабированного основного видео: {main_scaled_width}x{main_scaled_height}")
-        
-        # 2. Масштабируем фоновое видео до оставшихся 2/3 высоты
-        bg_target_height = output_height - main_scaled_height
-        print(f"  📐 Масштабируем фоновое видео (высота: {bg_target_height}px)")
-        
-        # Масштабируем с заполнением и обрезкой (crop) для сохранения пропорций
-        subprocess.run([
-            "ffmpeg", "-i", processed_bg,
-            "-vf", f"scale={output_width}:{bg_target_height}:force_original_aspect_ratio=increase,"
-                   f"crop={output_width}:{bg_target_height}:(iw-ow)/2:(ih-oh)/2",
-            "-c:a", "copy", "-y", temp_bg_scaled
-        ], check=True)
+    Args:
+        main_video (str): Путь к основному видео
+        background_video (str): Путь к фоновому видео (может быть None, если полоса уже в кэше)
+        output_file (str): Путь к итоговому видео
+        layout (CanvasLayout): Раскладка холста (по умолчанию - 9:16 для TikTok)
+        cache (RenderCache): Кэш подготовленных элементов
+        background_key (str): Ключ фонового видео в кэше, например его URL
+        keyframe_interval (int): Шаг принудительных ключевых кадров (обычно длительность части)
+        preview (PreviewSampler): Сборщик кадров для обложек и контактного листа
         
-        # 3. Соединяем масштабированные видео вертикально
-        print("  🔄 Объединяем масштабированные видео вертикально")
+    Returns:
+        str: Путь к итоговому видео или None при ошибке
+    """
+    if layout is None:
+        layout = default_layout()
+    print(f"🛠️ Объединяем видео в формате {layout.width}x{layout.height}...")
+    if cache is None:
+        cache = RenderCache()
+    
+    # Без фона итоговое видео не соответствует раскладке, поэтому отсутствие полосы
+    # в кэше - ошибка, а не повод подменить результат основным видео
+    if background_video is None and not cache.has_background_strip(background_key, layout.background):
+        raise FileNotFoundError(f"Фоновая полоса для {background_key} отсутствует в кэше, а фоновое видео не передано")
+    
+    try:
+        # Фоновая полоса и наложения готовятся один раз и переиспользуются между видео
+        background_strip = cache.background_strip(background_video, layout.background, key=background_key)
+        overlay_images = [cache.overlay_image(overlay) for overlay in layout.overlays]
         
-        # Если основное видео меньше выходной ширины, центрируем его
-        if main_scaled_width < output_width:
-            x_offset = int((output_width - main_scaled_width) / 2)
-            subprocess.run([
-                "ffmpeg", "-i", temp_main_scaled, "-i", temp_bg_scaled,
-                "-filter_complex",
-                f"[0:v]pad={output_width}:{main_scaled_height}:{x_offset}:0[top];"
-                "[top][1:v]vstack=inputs=2[v]",
-                "-map", "[v]", "-map", "0:a",
-                "-c:v", "libx264", "-crf", "28", "-preset", "fast",
-                "-aspect", "9:16", "-y", output_file
-            ], check=True)
+        print(f"  🔄 Создаем композицию {layout.width}x{layout.height}...")
+        command = build_composition_command(
+            main_video, background_strip, overlay_images, layout, output_file,
+            frame_rate=get_video_frame_rate(main_video),
+            keyframe_interval=keyframe_interval, preview=preview
+        )
+        if preview:
+            preview.run(command)
         else:
-            # Если основное видео шире выходной ширины, обрезаем его
-            if main_scaled_width > output_width:
-                print(f"  ✂️ Обрезаем основное видео по ширине (целевая ширина: {output_width}px)")
-                # Создаем дополнительный временный файл для обрезанного основного видео
-                temp_main_cropped = "temp_main_cropped.mp4"
-                subprocess.run([
-                    "ffmpeg", "-i", temp_main_scaled,
-                    "-vf", f"crop={output_width}:{main_scaled_height}:(iw-{output_width})/2:0",
-                    "-c:a", "copy", "-y", temp_main_cropped
-                ], check=True)
-                
-                # Используем обрезанное видео
-                temp_main_final = temp_main_cropped
-            else:
-                temp_main_final = temp_main_scaled
-            
-            # Объединяем видео
-            subprocess.run([
-                "ffmpeg", "-i", temp_main_final, "-i", temp_bg_scaled,
-                "-filter_complex", "[0:v][1:v]vstack=inputs=2[v]",
-                "-map", "[v]", "-map", "0:a",
-                "-c:v", "libx264", "-crf", "28", "-preset", "fast",
-                "-aspect", "9:16", "-y", output_file
-            ], check=True)
-            
-            # Удаляем дополнительный временный файл, если он был создан
-            if main_scaled_width > output_width and os.path.exists("temp_main_cropped.mp4"):
-                os.remove("temp_main_cropped.mp4")
-        
-        # Удаляем временные файлы
-        temp_files = [temp_bg_file, temp_main_scaled, temp_bg_scaled]
-        for file in temp_files:
-            if os.path.exists(file) and file not in [background_video, main_video]:
-                os.remove(file)
-                print(f"  🧹 Удален временный файл: {file}")
+            subprocess.run(command, check=True)
         
-        print(f"  ✅ Создано видео в формате 9:16: {output_file}")
+        print(f"  ✅ Создано видео в формате {layout.width}x{layout.height}: {output_file}")
         return output_file
         
     except Exception as e:
@@ -318,7 +245,23 @@ def combine_videos(main_video, background_video, output_file):
             print(f"❌ Не удалось создать выходной файл: {copy_error}")
             return None
 
-def split_video(video_file, output_folder, segment_time=120):
+def split_video(video_file, output_folder, segment_time=120, hls=False):
+    """
+    Нарезает видео на части без перекодирования
+    
+    Части записываются с moov-атомом в начале файла (faststart), чтобы их можно
+    было воспроизводить до полной загрузки. Длительности частей берутся из списка
+    сегментов ffmpeg, а не из повторного анализа каждой части.
+    
+    Args:
+        video_file (str): Путь к видео
+        output_folder (str): Папка для частей
+        segment_time (int): Длительность части в секундах
+        hls (bool): Дополнительно упаковать полное видео в HLS (папка hls)
+        
+    Returns:
+        tuple: (папка с частями, манифест нарезки - см. write_manifest)
+    """
     os.makedirs(output_folder, exist_ok=True)
     print("✂️ Нарезка видео на части...")
     
@@ -333,28 +276,36 @@ def split_video(video_file, output_folder, segment_time=120):
         f.write(f"Продолжительность: {video_info['duration_formatted']} ({video_info['duration']:.2f} сек)\n")
         f.write(f"Битрейт: {video_info['bitrate']} бит/с\n")
     
-    # Нарезаем видео на части
+    # Нарезаем видео на части, одновременно получая список сегментов с временами
+    segment_list_file = os.path.join(output_folder, "segments.csv")
     subprocess.run([
         "ffmpeg", "-i", video_file, "-c", "copy", "-map", "0",
         "-segment_time", str(segment_time), "-f", "segment", "-reset_timestamps", "1",
-        os.path.join(output_folder, "part_%03d.mp4")
-    ])
+        "-segment_format_options", "movflags=+faststart",
+        "-segment_list", segment_list_file, "-segment_list_type", "csv",
+        "-y", os.path.join(output_folder, "part_%03d.mp4")
+    ], check=True)
     
-    # Получаем список созданных частей
-    parts = [f for f in os.listdir(output_folder) if f.startswith("part_") and f.endswith(".mp4")]
-    parts.sort()
+    segments = read_segment_list(segment_list_file)
+    os.remove(segment_list_file)
+    parts = build_parts_manifest(output_folder, segments)
     
     # Создаем файл с информацией о частях
     parts_info_file = os.path.join(output_folder, "parts_info.txt")
     with open(parts_info_file, 'w', encoding='utf-8') as f:
         f.write(f"Информация о частях видео:\n")
         f.write(f"{'='*50}\n")
-        for i, part in enumerate(parts):
-            part_path = os.path.join(output_folder, part)
-            part_info = get_video_info(part_path)
-            f.write(f"Часть {i+1}: {part}\n")
-            f.write(f"Продолжительность: {part_info['duration_formatted']}\n")
-            f.write(f"Размер файла: {os.path.getsize(part_path) / (1024*1024):.2f} МБ\n")
+        for part in parts:
+            f.write(f"Часть {part['index']}: {part['file']}\n")
+            f.write(f"Продолжительность: {format_time(part['duration'])}\n")
+            f.write(f"Размер файла: {part['size_bytes'] / (1024*1024):.2f} МБ\n")
             f.write(f"{'='*50}\n")
     
-    return output_folder
\ No newline at end of file
+    hls_playlist = package_hls(video_file, os.path.join(output_folder, "hls")) if hls else None
+    
+    # Машиночитаемый манифест частей
+    manifest = write_manifest(
+        os.path.join(output_folder, "manifest.json"), video_file, video_info, segment_time, parts, hls_playlist
+    )
+    
+    return output_folder, manifest
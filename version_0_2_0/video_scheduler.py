@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+"""
+Планирование обработки с учетом свободного места на диске.
+
+DiskSpaceScheduler допускает задания к обработке только пока свободное место
+за вычетом зарезервированного остается выше порога. IntermediateFiles удаляет
+промежуточные файлы сразу после завершения последнего этапа, который их читает.
+"""
+
+import os
+import time
+import shutil
+import threading
+
+# Битрейт итогового видео 1080x1920 (libx264, crf 28, preset fast) с запасом
+COMBINED_BITRATE = 4_000_000
+# Битрейт, предполагаемый для видео до 1080p, если его не удалось определить
+DEFAULT_SOURCE_BITRATE = 8_000_000
+# Длительность, предполагаемая для видео, если она неизвестна до скачивания
+DEFAULT_DURATION = 600
+
+def parse_bitrate(value, default=DEFAULT_SOURCE_BITRATE):
+    """Преобразует битрейт из get_video_info ("неизвестно" или строка с числом) в бит/с"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+def estimate_stage_footprints(duration, source_bitrate=DEFAULT_SOURCE_BITRATE, background_bytes=0, hls=False):
+    """
+    Оценивает занятое место на диске на каждом этапе обработки одного видео
+    
+    Учитываются файлы, существующие одновременно во время этапа, при условии что
+    промежуточные файлы удаляются сразу после последнего использования.
+    
+    Args:
+        duration (float): Длительность основного видео в секундах
+        source_bitrate (int): Битрейт основного видео в бит/с
+        background_bytes (int): Размер фонового видео (0, если фон уже в кэше)
+        hls (bool): Создается ли HLS пакет
+        
+    Returns:
+        dict: Байты по этапам (download, subtitles, combine, split)
+    """
+    main_bytes = int(duration * source_bitrate / 8)
+    # Видео с субтитрами перекодируется с качеством, близким к исходному
+    subtitled_bytes = main_bytes
+    combined_bytes = int(duration * COMBINED_BITRATE / 8)
+    # Нарезки и HLS - копии итогового видео без перекодирования
+    packaged_bytes = combined_bytes * (2 if hls else 1)
+    
+    return {
+        'download': main_bytes + background_bytes,
+        'subtitles': main_bytes + background_bytes + subtitled_bytes,
+        # Фоновая полоса в кэше по размеру сопоставима с итоговым видео
+        'combine': background_bytes + subtitled_bytes + 2 * combined_bytes,
+        'split': combined_bytes + packaged_bytes
+    }
+
+def estimate_job_footprint(duration, source_bitrate=DEFAULT_SOURCE_BITRATE, background_bytes=0, hls=False):
+    """Оценивает пиковое место на диске для обработки одного видео"""
+    return max(estimate_stage_footprints(duration, source_bitrate, background_bytes, hls).values())
+
+def paths_size(paths):
+    """Суммарный размер существующих файлов и папок (с содержимым) в байтах"""
+    total = 0
+    for path in paths:
+        if not path:
+            continue
+        if os.path.isfile(path):
+            total += os.path.getsize(path)
+        elif os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                for name in files:
+                    file_path = os.path.join(root, name)
+                    if os.path.isfile(file_path):
+                        total += os.path.getsize(file_path)
+    return total
+
+class DiskSpaceScheduler:
+    """
+    Допуск заданий по свободному месту на диске
+    
+    Для каждого задания резервируется оценка пикового места. Уже записанные заданием
+    байты отражены в текущем свободном месте, поэтому из резерва вычитается то,
+    что задание сообщило через report_usage.
+    
+    Args:
+        folder (str): Папка на проверяемом томе
+        watermark_bytes (int): Минимальное свободное место, которое должно оставаться
+    """
+    def __init__(self, folder=".", watermark_bytes=5 * 1024 ** 3):
+        self.folder = folder
+        self.watermark_bytes = watermark_bytes
+        self.reserved = {}
+        self.used = {}
+        # Задания, ожидающие увеличения резерва, в порядке очереди
+        self.waiting = []
+        self._condition = threading.Condition()
+    
+    def free_bytes(self):
+        return shutil.disk_usage(self.folder).free
+    
+    def outstanding(self, job_id):
+        """Часть резерва задания, которую оно еще не записало на диск"""
+        return max(0, self.reserved.get(job_id, 0) - self.used.get(job_id, 0))
+    
+    def _fits(self, size, job_id=None):
+        others = [job for job in self.reserved if job != job_id]
+        # Собственные записанные байты задания уже учтены в свободном месте
+        size = max(0, size - self.used.get(job_id, 0))
+        available = self.free_bytes() - sum(self.outstanding(job) for job in others) - size
+        if available >= self.watermark_bytes:
+            return True
+        # Одно задание допускается всегда, иначе большое видео ждало бы бесконечно.
+        # Если все остальные задания тоже ждут места, первым продолжает старейшее из ожидающих
+        active = [job for job in others if job not in self.waiting]
+        return not active and (not self.waiting or self.waiting[0] == job_id)
+    
+    def _wait_until_fits(self, job_id, size, timeout=None):
+        if not self._fits(size, job_id):
+            print(f"⏳ Ожидание свободного места для задания {job_id} ({size / 1024 ** 3:.2f} ГБ)...")
+        # Место освобождается и другими процессами, поэтому проверяем его периодически
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._fits(size, job_id):
+            remaining = 5 if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._condition.wait(timeout=min(remaining, 5))
+        return True
+    
+    def admit(self, job_id, size, timeout=None):
+        """
+        Ожидает, пока задание поместится на диск, и резервирует для него место
+        
+        Args:
+            job_id (str): Идентификатор задания
+            size (int): Оценка пикового места в байтах
+            timeout (float): Максимальное время ожидания в секундах (None - без ограничения)
+            
+        Returns:
+            bool: True, если задание допущено
+        """
+        with self._condition:
+            if not self._wait_until_fits(job_id, size, timeout):
+                return False
+            if not self.reserved and self.free_bytes() - size < self.watermark_bytes:
+                print(f"⚠️ Задание {job_id} превышает порог свободного места, запускается без параллельных заданий")
+            self.reserved[job_id] = size
+            return True
+    
+    def update(self, job_id, size):
+        """
+        Уточняет резерв задания, например после анализа скачанного видео.
+        Если резерв растет, ожидает, пока новое значение поместится на диск.
+        """
+        with self._condition:
+            if job_id not in self.reserved:
+                return
+            if size > self.reserved[job_id]:
+                self.waiting.append(job_id)
+                # Остальные ожидающие могли ждать именно этого задания
+                self._condition.notify_all()
+                try:
+                    self._wait_until_fits(job_id, size)
+                finally:
+                    self.waiting.remove(job_id)
+            if job_id in self.reserved:
+                self.reserved[job_id] = size
+            self._condition.notify_all()
+    
+    def report_usage(self, job_id, used_bytes):
+        """Сообщает, сколько байт задание сейчас занимает на диске"""
+        with self._condition:
+            if job_id in self.reserved:
+                self.used[job_id] = used_bytes
+                self._condition.notify_all()
+    
+    def release(self, job_id):
+        """Снимает резерв задания и пробуждает ожидающие задания"""
+        with self._condition:
+            self.reserved.pop(job_id, None)
+            self.used.pop(job_id, None)
+            self._condition.notify_all()
+
+class IntermediateFiles:
+    """
+    Учет промежуточных файлов и этапов, которые их читают.
+    Файл удаляется, как только завершен последний из его этапов.
+    """
+    def __init__(self):
+        self.consumers = {}
+        self._lock = threading.Lock()
+    
+    def add(self, path, *stages):
+        """Регистрирует файл и этапы, которые будут его читать"""
+        if not path:
+            return
+        with self._lock:
+            self.consumers.setdefault(path, set()).update(stages)
+    
+    def stage_done(self, stage):
+        """
+        Отмечает этап завершенным и удаляет файлы, которые больше не нужны
+        
+        Returns:
+            list: Удаленные файлы
+        """
+        with self._lock:
+            finished = []
+            for path, stages in list(self.consumers.items()):
+                stages.discard(stage)
+                if not stages:
+                    finished.append(path)
+                    del self.consumers[path]
+        
+        removed = []
+        for path in finished:
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                    removed.append(path)
+                    print(f"  🧹 Удален промежуточный файл: {path}")
+                except OSError as e:
+                    print(f"  ✗ Не удалось удалить файл {path}: {e}")
+        return removed
+    
+    def remaining(self):
+        """Возвращает файлы, для которых еще не завершены все этапы"""
+        with self._lock:
+            return list(self.consumers)